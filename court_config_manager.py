@@ -237,7 +237,10 @@ class CourtConfigManager:
         """Get court configuration by code with caching"""
         # Ensure config is up to date
         self._load_config()
+        return self._get_loaded_court(court_code)
 
+    def _get_loaded_court(self, court_code: str) -> Optional[CourtInfo]:
+        """Get court configuration from the already-loaded config (no reload check)"""
         if court_code in self.courts_cache:
             return self.courts_cache[court_code]
 
@@ -279,7 +282,7 @@ class CourtConfigManager:
 
         for court_code, court_config in courts.items():
             if court_config.get('enabled', False):
-                court_info = self.get_court(court_code)
+                court_info = self._get_loaded_court(court_code)
                 if court_info:
                     enabled_courts.append(court_info)
 
@@ -293,7 +296,13 @@ class CourtConfigManager:
         """Get dict of all courts (enabled and disabled)"""
         self._load_config()
         courts = self.config_data.get('courts', {})
-        return {court_code: self.get_court(court_code) for court_code in courts.keys() if self.get_court(court_code)}
+        # Config was checked once above; resolve each court a single time
+        all_courts = {}
+        for court_code in courts.keys():
+            court_info = self._get_loaded_court(court_code)
+            if court_info:
+                all_courts[court_code] = court_info
+        return all_courts
 
     def get_default_court(self) -> str:
         """Get the default court code"""
@@ -309,6 +309,7 @@ class ValidatorFactory:
         # Return cached validator if available
         if court_code in self._validator_cache:
             return self._validator_cache[court_code]
+        requested_code = court_code
 
         # Check if court exists and is enabled
         if court_code not in self.courts_config.get('courts', {}):
@@ -322,6 +323,13 @@ class ValidatorFactory:
             court_code = self.courts_config.get('default_court', 'KEM')
             court_config = self.courts_config['courts'][court_code]
 
+        # Unknown/disabled codes resolve to the default court's validator;
+        # remember that so the fallback isn't rebuilt on every call
+        if court_code != requested_code and court_code in self._validator_cache:
+            validator = self._validator_cache[court_code]
+            self._validator_cache[requested_code] = validator
+            return validator
+
         # Determine validator type based on configuration
         validation_rules = court_config.get('validation_rules', {})
 
@@ -332,8 +340,9 @@ class ValidatorFactory:
             # Use digit range validator (default, compatible with KEM)
             validator = DigitRangeValidator(court_code, court_config)
 
-        # Cache the validator
+        # Cache the validator (under the requested code as well, for fallbacks)
         self._validator_cache[court_code] = validator
+        self._validator_cache[requested_code] = validator
 
         logger.info(f"Created {validator.__class__.__name__} for court '{court_code}'")
         return validator
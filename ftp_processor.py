@@ -15,12 +15,15 @@ import tempfile
 import shutil
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import List, Dict, Optional, Tuple, Any
+from typing import List, Dict, Optional, Tuple, Any, Iterator
 from dataclasses import dataclass, field, asdict
 import time
+import queue
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # Third-party utilities used by local processing functionalities
 import sqlite3
+import threading
 import hashlib
 import pandas as pd
 import PyPDF2
@@ -856,12 +859,14 @@ class FileProcessor:
         import re as _re
         total_lines = len(results)
         prefix = court_code.upper()
+        prefix_tab = f"{prefix}\t"
+        prefix_re = _re.compile(rf"^\s*{_re.escape(prefix)}\s+")
 
         def is_court_row(r: Dict) -> bool:
             raw = r.get('raw', '') or ''
             if not raw:
                 return False
-            starts_with_prefix = raw.startswith(f"{prefix}\t") or _re.match(rf"^\s*{_re.escape(prefix)}\s+", raw)
+            starts_with_prefix = raw.startswith(prefix_tab) or prefix_re.match(raw)
             if not starts_with_prefix:
                 return False
             if int(r.get('digits_count', 0) or 0) <= 0:
@@ -870,10 +875,14 @@ class FileProcessor:
                 return False
             return True
 
-        court_rows = [r for r in results if is_court_row(r)]
-        kem_lines = len(court_rows)
-        valid_lines = sum(1 for r in court_rows if r.get('is_valid'))
-        failed_lines = sum(1 for r in court_rows if not r.get('is_valid'))
+        # Single pass: count court rows and valid rows together
+        kem_lines = valid_lines = 0
+        for r in results:
+            if is_court_row(r):
+                kem_lines += 1
+                if r.get('is_valid'):
+                    valid_lines += 1
+        failed_lines = kem_lines - valid_lines
         validation_status = 'passed' if failed_lines == 0 and kem_lines > 0 else 'failed'
         return {
             'total_lines': total_lines,
@@ -1204,7 +1213,6 @@ class FileProcessor:
             archive_stats = {}
             for row in results:
                 court, total_files, total_size, oldest, newest, processed, invalid, expired = row
-                dir_stats = self._get_directory_statistics(court)
                 archive_stats[court] = {
                     'database_tracking': {
                         'total_files': total_files,
@@ -1215,10 +1223,17 @@ class FileProcessor:
                         'invalid_files': invalid,
                         'expired_files': expired
                     },
-                    'directory_analysis': dir_stats,
+                    'directory_analysis': {},
                     'retention_policy': self._get_court_retention_info(court)
                 }
             conn.close()
+            # Directory walks are I/O bound; scan the courts concurrently
+            courts = list(archive_stats.keys())
+            if courts:
+                with ThreadPoolExecutor(max_workers=min(8, len(courts))) as executor:
+                    futures = {executor.submit(self._get_directory_statistics, court): court for court in courts}
+                    for fut in as_completed(futures):
+                        archive_stats[futures[fut]]['directory_analysis'] = fut.result()
             if court_code and court_code in archive_stats:
                 return archive_stats[court_code]
             else:
@@ -1266,29 +1281,40 @@ class FileProcessor:
         total_size = 0
         monthly_breakdown = {}
         try:
-            for root, dirs, files in os.walk(directory):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    if os.path.isfile(file_path):
+            # scandir caches each entry's stat, so every file is stat'ed once
+            pending = [directory]
+            while pending:
+                root = pending.pop()
+                try:
+                    with os.scandir(root) as it:
+                        entries = list(it)
+                except OSError:
+                    continue
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(entry.path)
+                    elif entry.is_file():
+                        file_stat = entry.stat()
                         total_files += 1
-                        total_size += os.path.getsize(file_path)
-                        month = self._extract_month_from_path(root, file_path)
+                        total_size += file_stat.st_size
+                        month = self._extract_month_from_path(root, entry.path, file_stat.st_mtime)
                         if month not in monthly_breakdown:
                             monthly_breakdown[month] = {'files': 0, 'size_mb': 0}
                         monthly_breakdown[month]['files'] += 1
-                        monthly_breakdown[month]['size_mb'] += os.path.getsize(file_path) / (1024 * 1024)
+                        monthly_breakdown[month]['size_mb'] += file_stat.st_size / (1024 * 1024)
         except Exception as e:
             logger.warning(f"Failed to analyze directory {directory}: {e}")
         return total_files, total_size / (1024 * 1024), monthly_breakdown
 
-    def _extract_month_from_path(self, root: str, file_path: str) -> str:
+    def _extract_month_from_path(self, root: str, file_path: str, mtime: float = None) -> str:
         """Extract month identifier from path or file modification time"""
         try:
             path_parts = root.split(os.sep)
             for part in path_parts:
                 if len(part) == 7 and part[4] == '-' and part[:4].isdigit() and part[5:].isdigit():
                     return part
-            mtime = os.path.getmtime(file_path)
+            if mtime is None:
+                mtime = os.path.getmtime(file_path)
             return datetime.fromtimestamp(mtime).strftime('%Y-%m')
         except Exception:
             return datetime.now().strftime('%Y-%m')
@@ -1321,11 +1347,21 @@ class FileProcessor:
 
 
 # ==================== Database Manager (from kem_validator_local) ====================
+# processed_at is written by SQLite's CURRENT_TIMESTAMP; parsing with the known
+# format skips pandas' format inference (unparseable values become NaT)
+_PROCESSED_AT_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
 class DatabaseManager:
     """SQLite database for tracking processing history"""
 
     def __init__(self, db_path: str):
         self.db_path = db_path
+        # Long-lived connection and last result for get_data_version
+        self._version_conn: Optional[sqlite3.Connection] = None
+        self._version_lock = threading.Lock()
+        self._version_marker: Optional[int] = None
+        self._version: Tuple[int, int, int] = (0, 0, 0)
         self._init_database()
 
     def _init_database(self):
@@ -1392,18 +1428,39 @@ class DatabaseManager:
         conn.commit()
         conn.close()
 
+    def get_data_version(self) -> Tuple[int, int, int]:
+        """Change marker (row count, last id, commit counter), usable as a cache key.
+
+        PRAGMA data_version on a long-lived connection changes whenever any other
+        connection commits, so updates and deletes are seen too, and the
+        COUNT/MAX query only re-runs after a write.
+        """
+        with self._version_lock:
+            if self._version_conn is None:
+                self._version_conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            marker = self._version_conn.execute("PRAGMA data_version").fetchone()[0]
+            if marker != self._version_marker:
+                row = self._version_conn.execute(
+                    "SELECT COUNT(*), MAX(id) FROM processing_history"
+                ).fetchone()
+                self._version = (row[0], row[1] or 0, marker)
+                self._version_marker = marker
+            return self._version
+
     def get_history(self, limit: int = 100, court_code: Optional[str] = None) -> pd.DataFrame:
-        """Get processing history, optionally filtered by court"""
+        """Get processing history, optionally filtered by court (processed_at parsed to datetime)"""
         conn = sqlite3.connect(self.db_path)
         if court_code:
             df = pd.read_sql_query(
                 "SELECT * FROM processing_history WHERE court_code = ? ORDER BY processed_at DESC LIMIT ?",
-                conn, params=(court_code, limit)
+                conn, params=(court_code, limit),
+                parse_dates={'processed_at': {'format': _PROCESSED_AT_FORMAT, 'errors': 'coerce'}}
             )
         else:
             df = pd.read_sql_query(
                 "SELECT * FROM processing_history ORDER BY processed_at DESC LIMIT ?",
-                conn, params=(limit,)
+                conn, params=(limit,),
+                parse_dates={'processed_at': {'format': _PROCESSED_AT_FORMAT, 'errors': 'coerce'}}
             )
         conn.close()
         return df
@@ -1452,6 +1509,46 @@ class DatabaseManager:
             'total_failed_lines': result[7] or 0
         }
 
+    def get_daily_aggregates(self, court_code: Optional[str] = None, since: Optional[str] = None,
+                             until: Optional[str] = None, time_from: Optional[str] = None,
+                             time_until: Optional[str] = None) -> pd.DataFrame:
+        """Get per-day file counts and average success rate, aggregated in SQL.
+
+        since/until bound processed_at as ISO strings (since inclusive, until exclusive).
+        time_from/time_until ('HH:MM:SS', both inclusive) restrict the time of day;
+        time_from > time_until selects a window that crosses midnight.
+        """
+        where, params = [], []
+        if court_code:
+            where.append("court_code = ?")
+            params.append(court_code)
+        if since:
+            where.append("processed_at >= ?")
+            params.append(since)
+        if until:
+            where.append("processed_at < ?")
+            params.append(until)
+        if time_from and time_until:
+            joiner = "AND" if time_from <= time_until else "OR"
+            where.append(f"(time(processed_at) >= ? {joiner} time(processed_at) <= ?)")
+            params.extend([time_from, time_until])
+        query = '''
+            SELECT
+                date(processed_at) as date,
+                COUNT(*) as total_files,
+                SUM(CASE WHEN validation_status = 'passed' THEN 1 ELSE 0 END) as passed_files,
+                SUM(CASE WHEN validation_status = 'failed' THEN 1 ELSE 0 END) as failed_files,
+                AVG(success_rate) as avg_success_rate
+            FROM processing_history
+        '''
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        query += " GROUP BY date(processed_at) ORDER BY date"
+        conn = sqlite3.connect(self.db_path)
+        df = pd.read_sql_query(query, conn, params=params)
+        conn.close()
+        return df
+
     def get_court_summary(self) -> Dict:
         """Get summary statistics broken down by court"""
         conn = sqlite3.connect(self.db_path)
@@ -1566,13 +1663,17 @@ class KemValidatorCLI:
 
     def process_all_files(self):
         """Process all files in inbox"""
-        files = list(Path(self.config.input_dir).glob("*"))
+        with os.scandir(self.config.input_dir) as it:
+            files = [Path(e.path) for e in it if e.is_file()]
         print(f"Found {len(files)} files to process")
+        if not files:
+            return
 
-        for file_path in files:
-            if file_path.is_file():
-                result = self.processor.process_file(str(file_path))
-                print(f"Processed: {file_path.name} - {result['status']}")
+        # Text extraction/OCR dominates and is I/O-bound; overlap it across files
+        with ThreadPoolExecutor(max_workers=min(8, len(files))) as executor:
+            futures = {executor.submit(self.processor.process_file, str(f)): f for f in files}
+            for fut in as_completed(futures):
+                print(f"Processed: {futures[fut].name} - {fut.result()['status']}")
 
     def start_watcher(self):
         """Start file watcher"""
@@ -1651,6 +1752,8 @@ def parse_kem_id(line: str):
 KEM_MIN_DIGITS = 9
 KEM_MAX_DIGITS = 13
 DEFAULT_COURT = 'KEM'
+# Upper bound for max_parallel_connections (hand-edited configs included)
+MAX_PARALLEL_CONNECTIONS = 16
 
 
 class FTPConfig:
@@ -1723,6 +1826,7 @@ class FTPConfig:
                 "local_temp_dir": "ftp_temp",
                 "process_interval_minutes": 5,
                 "batch_size": 10,
+                "max_parallel_connections": 1,
                 "delete_after_download": False,
                 "upload_results": True,
                 "archive_on_ftp": True,
@@ -1770,6 +1874,14 @@ class FTPConfig:
 
         return enabled_courts
 
+    def get_max_parallel_connections(self) -> int:
+        """Configured FTP connections for parallel processing, clamped to 1..MAX_PARALLEL_CONNECTIONS"""
+        try:
+            value = int(getattr(self, 'max_parallel_connections', 1))
+        except (TypeError, ValueError):
+            value = 1
+        return min(max(value, 1), MAX_PARALLEL_CONNECTIONS)
+
     def detect_court_from_path(self, file_path: str) -> str:
         """Detect court from FTP file path"""
         if hasattr(self, 'court_detection'):
@@ -1786,11 +1898,16 @@ class FTPConfig:
 class FTPProcessor:
     """Main FTP Processor class"""
     
-    def __init__(self, ftp_config: FTPConfig = None, kem_config: Config = None):
-        """Initialize FTP Processor"""
+    def __init__(self, ftp_config: FTPConfig = None, kem_config: Config = None,
+                 file_processor: FileProcessor = None):
+        """Initialize FTP Processor (optionally sharing an existing FileProcessor)"""
         self.ftp_config = ftp_config or FTPConfig()
-        self.kem_config = kem_config or Config.from_json("config.json")
-        self.file_processor = FileProcessor(self.kem_config)
+        if file_processor is not None:
+            self.kem_config = kem_config or file_processor.config
+            self.file_processor = file_processor
+        else:
+            self.kem_config = kem_config or Config.from_json("config.json")
+            self.file_processor = FileProcessor(self.kem_config)
         self.ftp = None
         self._setup_local_dirs()
         
@@ -1814,7 +1931,7 @@ class FTPProcessor:
                 f"FTP chdir failed for '{path}'. Check exact spelling/case in WinSCP. ({e})"
             )
 
-    def connect_ftp(self) -> ftplib.FTP:
+    def connect_ftp(self, ensure_dirs: bool = True) -> ftplib.FTP:
         """Establish FTP connection"""
         try:
             logger.info(f"Connecting to FTP server: {self.ftp_config.ftp_server}")
@@ -1828,7 +1945,8 @@ class FTPProcessor:
             logger.info(f"Current directory: {ftp.pwd()}")
             
             # Ensure required directories exist on FTP
-            self._ensure_ftp_directories(ftp)
+            if ensure_dirs:
+                self._ensure_ftp_directories(ftp)
             
             self.ftp = ftp
             return ftp
@@ -2354,7 +2472,79 @@ class FTPProcessor:
         except Exception as e:
             logger.error(f"Error processing {court_code} court batch: {e}")
             return results
-    
+
+    def process_ftp_files_concurrently(self, filenames: List[str], court_code: str = None,
+                                       source_dir: str = None, max_workers: int = None) -> Iterator[Dict]:
+        """Process files over one or more FTP connections, yielding results as they complete.
+
+        ftplib connections are not thread-safe, so each worker owns one
+        connection: this processor's own, plus extra FTPProcessor clones (sharing
+        its configs and FileProcessor) up to max_workers, which defaults to the
+        config's max_parallel_connections.
+        """
+        if not filenames:
+            return
+        if max_workers is None:
+            max_workers = self.ftp_config.get_max_parallel_connections()
+        workers = max(1, min(int(max_workers), len(filenames)))
+
+        def process(proc: 'FTPProcessor', filename: str) -> Dict:
+            source_path = f"{source_dir.rstrip('/')}/{filename}" if source_dir else None
+            result = proc.process_ftp_file(filename, court_code=court_code, source_path=source_path)
+            result['filename'] = filename
+            return result
+
+        # Reuse the existing connection; one opened here (which also verifies
+        # the FTP directories) is closed again when done
+        opened_here = self.ftp is None
+        if opened_here:
+            try:
+                self.connect_ftp()
+            except Exception as e:
+                for filename in filenames:
+                    yield {"status": "failed", "reason": f"connect_failed: {e}",
+                           "court_code": court_code, "filename": filename}
+                return
+
+        pool: queue.Queue = queue.Queue()
+        pool.put(self)
+        clones = []
+
+        def run(filename: str) -> Dict:
+            proc = pool.get()
+            try:
+                return process(proc, filename)
+            finally:
+                pool.put(proc)
+
+        try:
+            if workers == 1:
+                for filename in filenames:
+                    yield process(self, filename)
+                return
+
+            # A clone that cannot log in (e.g. server connection limit) is
+            # dropped; its share of the files goes to the connected workers
+            for _ in range(workers - 1):
+                clone = FTPProcessor(self.ftp_config, self.kem_config, self.file_processor)
+                try:
+                    clone.connect_ftp(ensure_dirs=False)
+                except Exception as e:
+                    logger.warning(f"Extra FTP connection failed, continuing with {len(clones) + 1}: {e}")
+                    break
+                clones.append(clone)
+                pool.put(clone)
+
+            with ThreadPoolExecutor(max_workers=len(clones) + 1) as executor:
+                futures = [executor.submit(run, f) for f in filenames]
+                for future in as_completed(futures):
+                    yield future.result()
+        finally:
+            for clone in clones:
+                clone.disconnect_ftp()
+            if opened_here:
+                self.disconnect_ftp()
+
     def run_continuous(self, interval_minutes: int = None):
         """Run continuous processing at specified interval"""
         if not SCHEDULE_AVAILABLE:
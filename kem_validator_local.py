@@ -10,6 +10,7 @@ import csv
 import re
 import logging
 import sqlite3
+import threading
 import hashlib
 import base64
 from datetime import datetime, timedelta
@@ -17,20 +18,19 @@ from pathlib import Path
 from typing import List, Dict, Tuple, Optional, Any
 from dataclasses import dataclass, asdict
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from io import StringIO
 from dataclasses import dataclass, field, fields
 from typing import Any, Dict
 
 # Third-party imports (will be installed via requirements.txt)
 import pandas as pd
-import streamlit as st
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 import PyPDF2
 from PIL import Image
 import pytesseract
 import requests
-from openai import OpenAI
 
 # Optional imports - wrapped in try-except
 try:
@@ -1006,12 +1006,14 @@ class FileProcessor:
         # - start with the court prefix at the beginning of the line (tab or space form)
         # - have a non-empty parsed ID and at least one digit present
         prefix = court_code.upper()
+        prefix_tab = f"{prefix}\t"
+        prefix_re = re.compile(rf"^\s*{re.escape(prefix)}\s+")
 
         def is_court_row(r: Dict) -> bool:
             raw = r.get('raw', '') or ''
             if not raw:
                 return False
-            starts_with_prefix = raw.startswith(f"{prefix}\t") or re.match(rf"^\s*{re.escape(prefix)}\s+", raw)
+            starts_with_prefix = raw.startswith(prefix_tab) or prefix_re.match(raw)
             if not starts_with_prefix:
                 return False
             # Require that some digits were actually found to avoid counting headers
@@ -1022,11 +1024,14 @@ class FileProcessor:
                 return False
             return True
 
-        court_rows = [r for r in results if is_court_row(r)]
-
-        kem_lines = len(court_rows)
-        valid_lines = sum(1 for r in court_rows if r.get('is_valid'))
-        failed_lines = sum(1 for r in court_rows if not r.get('is_valid'))
+        # Single pass: count court rows and valid rows together
+        kem_lines = valid_lines = 0
+        for r in results:
+            if is_court_row(r):
+                kem_lines += 1
+                if r.get('is_valid'):
+                    valid_lines += 1
+        failed_lines = kem_lines - valid_lines
 
         validation_status = 'passed' if failed_lines == 0 and kem_lines > 0 else 'failed'
 
@@ -1470,15 +1475,11 @@ class FileProcessor:
                 cursor.execute(base_query + ' GROUP BY court_code')
                 results = cursor.fetchall()
 
-            # Also get directory-based statistics
             archive_stats = {}
 
             for row in results:
                 court, total_files, total_size, oldest, newest, processed, invalid, expired = row
 
-                # Calculate directory statistics
-                dir_stats = self._get_directory_statistics(court)
-
                 archive_stats[court] = {
                     'database_tracking': {
                         'total_files': total_files,
@@ -1489,12 +1490,21 @@ class FileProcessor:
                         'invalid_files': invalid,
                         'expired_files': expired
                     },
-                    'directory_analysis': dir_stats,
+                    'directory_analysis': {},
                     'retention_policy': self._get_court_retention_info(court)
                 }
 
             conn.close()
 
+            # Also get directory-based statistics; the walks are I/O bound,
+            # so scan the courts concurrently
+            courts = list(archive_stats.keys())
+            if courts:
+                with ThreadPoolExecutor(max_workers=min(8, len(courts))) as executor:
+                    futures = {executor.submit(self._get_directory_statistics, court): court for court in courts}
+                    for fut in as_completed(futures):
+                        archive_stats[futures[fut]]['directory_analysis'] = fut.result()
+
             if court_code and court_code in archive_stats:
                 return archive_stats[court_code]
             else:
@@ -1554,26 +1564,36 @@ class FileProcessor:
         monthly_breakdown = {}
 
         try:
-            for root, dirs, files in os.walk(directory):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    if os.path.isfile(file_path):
+            # scandir caches each entry's stat, so every file is stat'ed once
+            pending = [directory]
+            while pending:
+                root = pending.pop()
+                try:
+                    with os.scandir(root) as it:
+                        entries = list(it)
+                except OSError:
+                    continue
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(entry.path)
+                    elif entry.is_file():
+                        file_stat = entry.stat()
                         total_files += 1
-                        total_size += os.path.getsize(file_path)
+                        total_size += file_stat.st_size
 
                         # Extract month from directory structure or file date
-                        month = self._extract_month_from_path(root, file_path)
+                        month = self._extract_month_from_path(root, entry.path, file_stat.st_mtime)
                         if month not in monthly_breakdown:
                             monthly_breakdown[month] = {'files': 0, 'size_mb': 0}
                         monthly_breakdown[month]['files'] += 1
-                        monthly_breakdown[month]['size_mb'] += os.path.getsize(file_path) / (1024 * 1024)
+                        monthly_breakdown[month]['size_mb'] += file_stat.st_size / (1024 * 1024)
 
         except Exception as e:
             logger.warning(f"Failed to analyze directory {directory}: {e}")
 
         return total_files, total_size / (1024 * 1024), monthly_breakdown
 
-    def _extract_month_from_path(self, root: str, file_path: str) -> str:
+    def _extract_month_from_path(self, root: str, file_path: str, mtime: float = None) -> str:
         """Extract month identifier from path or file modification time"""
         try:
             # Try to extract from directory structure (YYYY-MM format)
@@ -1583,7 +1603,8 @@ class FileProcessor:
                     return part
 
             # Fall back to file modification time
-            mtime = os.path.getmtime(file_path)
+            if mtime is None:
+                mtime = os.path.getmtime(file_path)
             return datetime.fromtimestamp(mtime).strftime('%Y-%m')
 
         except Exception:
@@ -1619,11 +1640,21 @@ class FileProcessor:
 
 
 # ==================== Database Manager ====================
+# processed_at is written by SQLite's CURRENT_TIMESTAMP; parsing with the known
+# format skips pandas' format inference (unparseable values become NaT)
+_PROCESSED_AT_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
 class DatabaseManager:
     """SQLite database for tracking processing history"""
     
     def __init__(self, db_path: str):
         self.db_path = db_path
+        # Long-lived connection and last result for get_data_version
+        self._version_conn: Optional[sqlite3.Connection] = None
+        self._version_lock = threading.Lock()
+        self._version_marker: Optional[int] = None
+        self._version: Tuple[int, int, int] = (0, 0, 0)
         self._init_database()
     
     def _init_database(self):
@@ -1759,19 +1790,40 @@ class DatabaseManager:
         conn.commit()
         conn.close()
     
+    def get_data_version(self) -> Tuple[int, int, int]:
+        """Change marker (row count, last id, commit counter), usable as a cache key.
+
+        PRAGMA data_version on a long-lived connection changes whenever any other
+        connection commits, so updates and deletes are seen too, and the
+        COUNT/MAX query only re-runs after a write.
+        """
+        with self._version_lock:
+            if self._version_conn is None:
+                self._version_conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            marker = self._version_conn.execute("PRAGMA data_version").fetchone()[0]
+            if marker != self._version_marker:
+                row = self._version_conn.execute(
+                    "SELECT COUNT(*), MAX(id) FROM processing_history"
+                ).fetchone()
+                self._version = (row[0], row[1] or 0, marker)
+                self._version_marker = marker
+            return self._version
+
     def get_history(self, limit: int = 100, court_code: Optional[str] = None) -> pd.DataFrame:
-        """Get processing history, optionally filtered by court"""
+        """Get processing history, optionally filtered by court (processed_at parsed to datetime)"""
         conn = sqlite3.connect(self.db_path)
 
         if court_code:
             df = pd.read_sql_query(
                 "SELECT * FROM processing_history WHERE court_code = ? ORDER BY processed_at DESC LIMIT ?",
-                conn, params=(court_code, limit)
+                conn, params=(court_code, limit),
+                parse_dates={'processed_at': {'format': _PROCESSED_AT_FORMAT, 'errors': 'coerce'}}
             )
         else:
             df = pd.read_sql_query(
                 "SELECT * FROM processing_history ORDER BY processed_at DESC LIMIT ?",
-                conn, params=(limit,)
+                conn, params=(limit,),
+                parse_dates={'processed_at': {'format': _PROCESSED_AT_FORMAT, 'errors': 'coerce'}}
             )
 
         conn.close()
@@ -1824,6 +1876,46 @@ class DatabaseManager:
             'total_failed_lines': result[7] or 0
         }
 
+    def get_daily_aggregates(self, court_code: Optional[str] = None, since: Optional[str] = None,
+                             until: Optional[str] = None, time_from: Optional[str] = None,
+                             time_until: Optional[str] = None) -> pd.DataFrame:
+        """Get per-day file counts and average success rate, aggregated in SQL.
+
+        since/until bound processed_at as ISO strings (since inclusive, until exclusive).
+        time_from/time_until ('HH:MM:SS', both inclusive) restrict the time of day;
+        time_from > time_until selects a window that crosses midnight.
+        """
+        where, params = [], []
+        if court_code:
+            where.append("court_code = ?")
+            params.append(court_code)
+        if since:
+            where.append("processed_at >= ?")
+            params.append(since)
+        if until:
+            where.append("processed_at < ?")
+            params.append(until)
+        if time_from and time_until:
+            joiner = "AND" if time_from <= time_until else "OR"
+            where.append(f"(time(processed_at) >= ? {joiner} time(processed_at) <= ?)")
+            params.extend([time_from, time_until])
+        query = '''
+            SELECT
+                date(processed_at) as date,
+                COUNT(*) as total_files,
+                SUM(CASE WHEN validation_status = 'passed' THEN 1 ELSE 0 END) as passed_files,
+                SUM(CASE WHEN validation_status = 'failed' THEN 1 ELSE 0 END) as failed_files,
+                AVG(success_rate) as avg_success_rate
+            FROM processing_history
+        '''
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        query += " GROUP BY date(processed_at) ORDER BY date"
+        conn = sqlite3.connect(self.db_path)
+        df = pd.read_sql_query(query, conn, params=params)
+        conn.close()
+        return df
+
     def get_court_summary(self) -> Dict:
         """Get summary statistics broken down by court"""
         conn = sqlite3.connect(self.db_path)
@@ -1941,13 +2033,17 @@ class KemValidatorCLI:
     
     def process_all_files(self):
         """Process all files in inbox"""
-        files = list(Path(self.config.input_dir).glob("*"))
+        with os.scandir(self.config.input_dir) as it:
+            files = [Path(e.path) for e in it if e.is_file()]
         print(f"Found {len(files)} files to process")
-        
-        for file_path in files:
-            if file_path.is_file():
-                result = self.processor.process_file(str(file_path))
-                print(f"Processed: {file_path.name} - {result['status']}")
+        if not files:
+            return
+
+        # Text extraction/OCR dominates and is I/O-bound; overlap it across files
+        with ThreadPoolExecutor(max_workers=min(8, len(files))) as executor:
+            futures = {executor.submit(self.processor.process_file, str(f)): f for f in files}
+            for fut in as_completed(futures):
+                print(f"Processed: {futures[fut].name} - {fut.result()['status']}")
     
     def start_watcher(self):
         """Start file watcher"""
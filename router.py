@@ -6,12 +6,107 @@ Analyzes files using multiple signals to determine the appropriate court.
 import re
 import json
 import hashlib
+import heapq
+from functools import lru_cache
+from collections import namedtuple
 from typing import Dict, Tuple, List, Optional, Any
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import logging
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
+# Filename date used for recency scoring: YYYYMMDD, YYYY-MM-DD or YYYY_MM_DD.
+# Separators are all-or-nothing, so half-separated runs like 2026-1010 never match.
+# Zero-width lookahead: finditer yields a candidate at every position, so an
+# invalid digit run cannot swallow the start of a real date next to it.
+_DATE_RE = re.compile(r'(?=(?P<ymd>\d{4}[-_]\d{2}[-_]\d{2}|\d{8}))')
+
+# Deletes ASCII digits; digit count is the length difference after translate
+_DEL_DIGITS = str.maketrans('', '', '0123456789')
+
+
+@lru_cache(maxsize=256)
+def _compile_patterns(patterns: Tuple[str, ...]) -> List[re.Pattern]:
+    """Compile routing hint patterns (case-insensitive), skipping invalid ones."""
+    compiled = []
+    for pattern in patterns:
+        try:
+            compiled.append(re.compile(pattern, re.IGNORECASE))
+        except re.error as e:
+            logger.warning(f"Invalid regex pattern {pattern}: {e}")
+    return compiled
+
+
+# Compiled routing hints for one court, shared by every CourtRouter
+CompiledHints = namedtuple('CompiledHints', [
+    'prefixes_upper', 'path_patterns', 'content_patterns',
+    'validation_rule', 'min_digits', 'max_digits',
+])
+
+_COURT_CACHE: Dict[Tuple, CompiledHints] = {}
+
+
+def _get_compiled(court_code: str, court_config: Dict) -> CompiledHints:
+    """
+    Get compiled routing hints for a court, compiling on first use.
+
+    Entries are keyed by the court's hint values so that a changed
+    configuration is recompiled rather than served stale, and live for the
+    lifetime of the process.
+    """
+    routing_hints = court_config.get('routing_hints', {})
+    key = (
+        court_code,
+        tuple(routing_hints.get('path_patterns', [])),
+        tuple(routing_hints.get('content_prefixes', [])),
+        tuple(routing_hints.get('filename_prefixes', [])),
+        court_config.get('validation_rule', 'digit_range'),
+        court_config.get('min_digits', 9),
+        court_config.get('max_digits', 13),
+    )
+
+    compiled = _COURT_CACHE.get(key)
+    if compiled is None:
+        compiled = CompiledHints(
+            # Default: check if filename starts with court code
+            prefixes_upper=tuple(p.upper() for p in (key[3] or (f"{court_code}_",))),
+            path_patterns=_compile_patterns(key[1]),
+            content_patterns=_compile_patterns(key[2]),
+            validation_rule=key[4],
+            min_digits=key[5],
+            max_digits=key[6],
+        )
+        _COURT_CACHE[key] = compiled
+    return compiled
+
+
+def _dumps_compact(data: Any) -> str:
+    """Serialize audit data to compact JSON; datetimes become ISO strings."""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(data).decode('utf-8')
+    return json.dumps(data, separators=(',', ':'), default=datetime.isoformat)
+
+
+def _head_lines(s: str, n: int) -> str:
+    """
+    Return the first n lines of s (equivalent to '\\n'.join(s.split('\\n')[:n]))
+    without splitting the whole string.
+    """
+    if n <= 0:
+        return ''
+    pos = -1
+    for _ in range(n):
+        pos = s.find('\n', pos + 1)
+        if pos == -1:
+            return s
+    return s[:pos]
+
 
 class CourtRouter:
     """
@@ -28,14 +123,15 @@ class CourtRouter:
     
     def __init__(self):
         self.logger = logger.getChild(self.__class__.__name__)
-    
+
     def classify_court(
         self,
         file_meta: Dict[str, Any],
         text: str,
         courts: Dict[str, Dict],
         default_code: str,
-        router_cfg: Dict[str, Any]
+        router_cfg: Dict[str, Any],
+        now: Optional[datetime] = None
     ) -> Tuple[str, int, str, str]:
         """
         Classify a file to determine which court it belongs to.
@@ -46,11 +142,16 @@ class CourtRouter:
             courts: Court configurations from CourtConfigManager
             default_code: Default court code if classification fails
             router_cfg: Router configuration with thresholds and mode
+            now: Reference time for date recency and the audit timestamp;
+                batch callers can pass one value for the whole batch
             
         Returns:
             Tuple of (winner_code, confidence, explanation, scores_json)
         """
         try:
+            if now is None:
+                now = datetime.now()
+            
             # Calculate scores for each enabled court
             court_scores = {}
             scoring_details = {}
@@ -60,7 +161,7 @@ class CourtRouter:
                     continue
                     
                 score, details = self._score_court(
-                    file_meta, text, court_code, court_config
+                    file_meta, text, court_code, court_config, now
                 )
                 court_scores[court_code] = score
                 scoring_details[court_code] = details
@@ -79,9 +180,9 @@ class CourtRouter:
                 'details': scoring_details,
                 'winner': winner_code,
                 'confidence': confidence,
-                'timestamp': datetime.now().isoformat()
+                'timestamp': now
             }
-            scores_json = json.dumps(scores_data, separators=(',', ':'))
+            scores_json = _dumps_compact(scores_data)
             
             return winner_code, confidence, explanation, scores_json
             
@@ -95,7 +196,8 @@ class CourtRouter:
         file_meta: Dict,
         text: str,
         court_code: str,
-        court_config: Dict
+        court_config: Dict,
+        now: Optional[datetime] = None
     ) -> Tuple[int, Dict]:
         """
         Calculate score for a specific court based on multiple signals.
@@ -114,73 +216,70 @@ class CourtRouter:
         }
         
         routing_hints = court_config.get('routing_hints', {})
+        compiled = _get_compiled(court_code, court_config)
         
         # 1. Filename prefix scoring (+50)
         filename = file_meta.get('filename', '').upper()
-        filename_prefixes = routing_hints.get('filename_prefixes', [])
-        if not filename_prefixes:
-            # Default: check if filename starts with court code
-            filename_prefixes = [f"{court_code}_", f"{court_code.lower()}_"]
-        
-        for prefix in filename_prefixes:
-            if filename.startswith(prefix.upper()):
-                score += self.WEIGHT_FILENAME
-                details['filename_match'] = True
-                details['breakdown']['filename'] = self.WEIGHT_FILENAME
-                break
+        if filename.startswith(compiled.prefixes_upper):
+            score += self.WEIGHT_FILENAME
+            details['filename_match'] = True
+            details['breakdown']['filename'] = self.WEIGHT_FILENAME
         
         # 2. Path pattern scoring (+30)
         remote_path = file_meta.get('remote_path', '')
-        path_patterns = routing_hints.get('path_patterns', [])
+        path_patterns = compiled.path_patterns
         
         for pattern in path_patterns:
-            if re.search(pattern, remote_path, re.IGNORECASE):
+            if pattern.search(remote_path):
                 score += self.WEIGHT_PATH
                 details['path_match'] = True
                 details['breakdown']['path'] = self.WEIGHT_PATH
                 break
         
         # 3. Content prefix scoring (+3 per match, max +10)
-        content_prefixes = routing_hints.get('content_prefixes', [])
-        if content_prefixes and text:
+        if compiled.content_patterns and text:
             # Check first N lines (default 100)
-            lines = text.split('\n')[:100]
-            content_text = '\n'.join(lines)
+            content_text = _head_lines(text, 100)
             
-            content_score = 0
-            for pattern in content_prefixes:
-                try:
-                    matches = len(re.findall(pattern, content_text, re.IGNORECASE))
-                    details['content_matches'] += matches
-                    content_score += matches * self.WEIGHT_CONTENT_PER_MATCH
-                except re.error as e:
-                    self.logger.warning(f"Invalid regex pattern {pattern}: {e}")
+            # Each pattern counts its own matches (overlapping prefixes each
+            # score), and the full count is kept for the audit trail
+            matches = sum(1 for p in compiled.content_patterns for _ in p.finditer(content_text))
+            details['content_matches'] = matches
             
             # Cap content score at max weight
-            content_score = min(content_score, self.WEIGHT_CONTENT_MAX)
+            content_score = min(matches * self.WEIGHT_CONTENT_PER_MATCH, self.WEIGHT_CONTENT_MAX)
             score += content_score
             if content_score > 0:
                 details['breakdown']['content'] = content_score
         
         # 4. Validation ratio scoring (+0 to +100)
-        valid_ratio = self._calculate_valid_ratio(text, court_config)
-        ratio_score = int(valid_ratio * self.WEIGHT_VALID_RATIO_MULTIPLIER)
-        score += ratio_score
-        details['valid_ratio'] = valid_ratio
-        if ratio_score > 0:
+        if details['filename_match'] and routing_hints.get('trust_filename'):
+            # Court opted to trust its filename prefix: skip the full-text pass
+            # but credit the full ratio weight, so rivals scoring their own
+            # ratio cannot outrank the court the filename names
+            ratio_score = self.WEIGHT_VALID_RATIO_MULTIPLIER
+            score += ratio_score
+            details['valid_ratio'] = None
             details['breakdown']['valid_ratio'] = ratio_score
+        else:
+            valid_ratio = self._calculate_valid_ratio(text, compiled)
+            ratio_score = int(valid_ratio * self.WEIGHT_VALID_RATIO_MULTIPLIER)
+            score += ratio_score
+            details['valid_ratio'] = valid_ratio
+            if ratio_score > 0:
+                details['breakdown']['valid_ratio'] = ratio_score
         
         # 5. Date recency scoring (+10)
         date_recency_days = routing_hints.get('date_recency_days')
         if date_recency_days:
-            if self._is_date_recent(file_meta, text, date_recency_days):
+            if self._is_date_recent(file_meta, text, date_recency_days, now):
                 score += self.WEIGHT_DATE_RECENCY
                 details['date_recent'] = True
                 details['breakdown']['date_recency'] = self.WEIGHT_DATE_RECENCY
         
         return score, details
     
-    def _calculate_valid_ratio(self, text: str, court_config: Dict) -> float:
+    def _calculate_valid_ratio(self, text: str, compiled: CompiledHints) -> float:
         """
         Calculate ratio of valid lines for this court's validation rules.
         This is a simplified version - actual implementation would call
@@ -189,32 +288,35 @@ class CourtRouter:
         if not text:
             return 0.0
         
-        lines = text.split('\n')
-        if not lines:
-            return 0.0
-        
         # Simple heuristic based on court validation rules
-        validation_rule = court_config.get('validation_rule', 'digit_range')
-        
-        if validation_rule == 'digit_range':
-            min_digits = court_config.get('min_digits', 9)
-            max_digits = court_config.get('max_digits', 13)
-            
-            valid_count = 0
-            total_count = 0
+        if compiled.validation_rule == 'digit_range':
+            min_digits, max_digits = compiled.min_digits, compiled.max_digits
             
-            for line in lines:
-                line = line.strip()
-                if not line or line.startswith('#'):  # Skip empty/comment lines
+            # Scan line by line without materializing a list of lines
+            valid_count = total = 0
+            start = 0
+            text_len = len(text)
+            while start < text_len:
+                end = text.find('\n', start)
+                if end == -1:
+                    end = text_len
+                line = text[start:end].strip()
+                start = end + 1
+                
+                # Skip empty/comment lines
+                if not line or line[0] == '#':
                     continue
-                    
-                total_count += 1
-                # Extract digits from line
-                digits = ''.join(c for c in line if c.isdigit())
-                if min_digits <= len(digits) <= max_digits:
+                total += 1
+                
+                # Count digits with a C-level translate rather than a
+                # per-character generator
+                digits = len(line) - len(line.translate(_DEL_DIGITS))
+                if min_digits <= digits <= max_digits:
                     valid_count += 1
             
-            return valid_count / total_count if total_count > 0 else 0.0
+            if not total:
+                return 0.0
+            return valid_count / total
         
         # Default for unknown validation rules
         return 0.5
@@ -223,7 +325,8 @@ class CourtRouter:
         self, 
         file_meta: Dict,
         text: str,
-        recency_days: int
+        recency_days: int,
+        now: Optional[datetime] = None
     ) -> bool:
         """
         Check if file contains recent dates within the recency window.
@@ -231,22 +334,23 @@ class CourtRouter:
         try:
             # Check filename for date pattern (YYYYMMDD or similar)
             filename = file_meta.get('filename', '')
-            date_patterns = [
-                r'(\d{8})',  # YYYYMMDD
-                r'(\d{4}[-_]\d{2}[-_]\d{2})',  # YYYY-MM-DD or YYYY_MM_DD
-            ]
+            if now is None:
+                now = datetime.now()
             
-            for pattern in date_patterns:
-                match = re.search(pattern, filename)
-                if match:
-                    date_str = match.group(1).replace('-', '').replace('_', '')
-                    try:
-                        file_date = datetime.strptime(date_str[:8], '%Y%m%d')
-                        days_diff = (datetime.now() - file_date).days
-                        if 0 <= days_diff <= recency_days:
-                            return True
-                    except ValueError:
-                        pass
+            # A digit run that is not a date (IDs, invalid months) must not
+            # hide a real date later in the name
+            for match in _DATE_RE.finditer(filename):
+                date_str = match.group('ymd').replace('-', '').replace('_', '')
+                try:
+                    # Direct slicing avoids strptime's pure-Python parser
+                    file_date = date(
+                        int(date_str[:4]), int(date_str[4:6]), int(date_str[6:8])
+                    )
+                except ValueError:
+                    continue
+                days_diff = (now.date() - file_date).days
+                if 0 <= days_diff <= recency_days:
+                    return True
             
             # Could also check content for dates, but keeping simple for now
             
@@ -271,12 +375,8 @@ class CourtRouter:
         if not court_scores:
             return default_code, 0, "No courts available for classification"
         
-        # Sort courts by score (descending)
-        sorted_courts = sorted(
-            court_scores.items(), 
-            key=lambda x: x[1], 
-            reverse=True
-        )
+        # Only the top two courts matter (descending by score)
+        sorted_courts = heapq.nlargest(2, court_scores.items(), key=lambda x: x[1])
         
         top_court, top_score = sorted_courts[0]
         
@@ -305,12 +405,17 @@ class CourtRouter:
         return top_court, confidence, explanation
 
 
+# Shared instance for the module-level entry point; CourtRouter is stateless
+_ROUTER = CourtRouter()
+
+
 def classify_court(
     file_meta: Dict[str, Any],
     text: str,
     courts: Dict[str, Dict],
     default_code: str,
-    router_cfg: Dict[str, Any]
+    router_cfg: Dict[str, Any],
+    now: Optional[datetime] = None
 ) -> Tuple[str, int, str, str]:
     """
     Module-level function for court classification.
@@ -323,12 +428,19 @@ def classify_court(
         courts: Court configurations from CourtConfigManager
         default_code: Default court code if classification fails
         router_cfg: Router configuration with thresholds and mode
+        now: Optional reference time, computed once per batch by the caller
         
     Returns:
         Tuple of (winner_code, confidence, explanation, scores_json)
     """
-    router = CourtRouter()
-    return router.classify_court(file_meta, text, courts, default_code, router_cfg)
+    return _ROUTER.classify_court(file_meta, text, courts, default_code, router_cfg, now)
+
+
+@lru_cache(maxsize=4096)
+def _idempotency_key(remote_path: str, size: Any, mtime: Any) -> str:
+    """SHA256 of the composite key; memoized for files seen repeatedly."""
+    key_parts = f"{remote_path}|{size}|{mtime}"
+    return hashlib.sha256(key_parts.encode('utf-8')).hexdigest()
 
 
 def generate_idempotency_key(file_meta: Dict[str, Any]) -> str:
@@ -341,15 +453,27 @@ def generate_idempotency_key(file_meta: Dict[str, Any]) -> str:
     Returns:
         SHA256 hash as hex string
     """
-    remote_path = file_meta.get('remote_path', '')
-    size = file_meta.get('size', 0)
-    mtime = file_meta.get('mtime', '')
-    
-    # Create composite key
-    key_parts = f"{remote_path}|{size}|{mtime}"
+    return _idempotency_key(
+        file_meta.get('remote_path', ''),
+        file_meta.get('size', 0),
+        file_meta.get('mtime', '')
+    )
+
+
+def generate_idempotency_keys(metas: List[Dict[str, Any]]) -> List[str]:
+    """
+    Generate idempotency keys for a batch of files.
     
-    # Generate SHA256 hash
-    return hashlib.sha256(key_parts.encode('utf-8')).hexdigest()
+    Args:
+        metas: List of file metadata dictionaries (see generate_idempotency_key)
+        
+    Returns:
+        List of SHA256 hex strings, in the same order as metas
+    """
+    return [
+        _idempotency_key(m.get('remote_path', ''), m.get('size', 0), m.get('mtime', ''))
+        for m in metas
+    ]
 
 
 def create_quarantine_report(
@@ -357,7 +481,8 @@ def create_quarantine_report(
     court_scores: Dict[str, int],
     explanation: str,
     text_preview: str = None,
-    preview_lines: int = 20
+    preview_lines: int = 20,
+    now: Optional[datetime] = None
 ) -> List[Dict]:
     """
     Create a CSV-ready report for quarantined files.
@@ -368,6 +493,7 @@ def create_quarantine_report(
         explanation: Routing explanation
         text_preview: Optional text content for preview
         preview_lines: Number of lines to include in preview
+        now: Optional report timestamp, shared across a batch
         
     Returns:
         List of dictionaries for CSV writing
@@ -375,11 +501,7 @@ def create_quarantine_report(
     report_data = []
     
     # Sort courts by score for top 5
-    sorted_scores = sorted(
-        court_scores.items(), 
-        key=lambda x: x[1], 
-        reverse=True
-    )[:5]
+    sorted_scores = heapq.nlargest(5, court_scores.items(), key=lambda x: x[1])
     
     # Base record
     record = {
@@ -388,7 +510,7 @@ def create_quarantine_report(
         'file_size': file_meta.get('size', 0),
         'modified_time': file_meta.get('mtime', ''),
         'routing_explanation': explanation,
-        'timestamp': datetime.now().isoformat()
+        'timestamp': (now or datetime.now()).isoformat()
     }
     
     # Add top 5 court scores
@@ -398,9 +520,9 @@ def create_quarantine_report(
     
     # Add text preview if available
     if text_preview:
-        lines = text_preview.split('\n')[:preview_lines]
-        record['preview_lines'] = len(lines)
-        record['text_preview'] = '\n'.join(lines)[:1000]  # Limit preview size
+        preview = _head_lines(text_preview, preview_lines)
+        record['preview_lines'] = preview.count('\n') + 1 if preview_lines > 0 else 0
+        record['text_preview'] = preview[:1000]  # Limit preview size
     
     report_data.append(record)
     
@@ -3,12 +3,13 @@ Streamlit Web Interface for File Validator with FTP Integration (cleaned)
 """
 
 import json
+import os
 from pathlib import Path
 
 import pandas as pd
 import streamlit as st
 
-from ftp_processor import FTPProcessor, FTPConfig, DatabaseManager
+from ftp_processor import FTPProcessor, FTPConfig, Config, FileProcessor, MAX_PARALLEL_CONNECTIONS
 
 try:
     from court_config_manager import CourtConfigManager
@@ -20,9 +21,116 @@ except Exception:
 
 st.set_page_config(page_title="Court Validator - FTP", page_icon="📁", layout="wide")
 
+# Rows sent to a table widget per render; larger listings are paginated
+MAX_TABLE_ROWS = 500
+
+FTP_CONFIG_PATH = "ftp_config.json"
+
+# Settings that require a new FTP login when changed
+CONNECTION_KEYS = ("ftp_server", "ftp_port", "ftp_username", "ftp_password")
+
+
+# Shared across sessions and reruns: config parsing, DB init and court loading
+# happen once per process. The FTP connection itself stays per session.
+@st.cache_resource
+def get_file_processor() -> FileProcessor:
+    return FileProcessor(Config.from_json("config.json"))
+
+
+@st.cache_resource
+def get_court_manager():
+    return CourtConfigManager()  # type: ignore
+
+
+@st.cache_resource
+def get_ftp_config(mtime: float) -> FTPConfig:
+    """Parsed ftp_config.json shared by all sessions; re-read when the file's mtime changes."""
+    return FTPConfig(FTP_CONFIG_PATH)
+
+
+def ftp_config_mtime() -> float:
+    try:
+        return os.path.getmtime(FTP_CONFIG_PATH)
+    except OSError:
+        return 0.0
+
+
+def data_version() -> tuple:
+    """Changes whenever processing_history changes; part of the DB read cache keys."""
+    return get_file_processor().db.get_data_version()
+
+
+# Keyed on data_version(), so a long TTL never serves rows older than the DB
+@st.cache_data(ttl=300)
+def cached_stats(court_code=None, version=None) -> dict:
+    return get_file_processor().db.get_statistics(court_code)
+
+
+@st.cache_data(ttl=300)
+def cached_history(limit: int, court_code=None, version=None) -> pd.DataFrame:
+    return get_file_processor().db.get_history(limit, court_code)
+
+
+@st.cache_data
+def get_court_options(court_codes: tuple, include_all: bool = False) -> dict:
+    """Selectbox labels ("Name (CODE)") to court codes; the court list is static."""
+    courts = get_court_manager().get_all_courts()
+    options = {"All Courts": None} if include_all else {}
+    for code in court_codes:
+        name = getattr(courts.get(code), 'name', code)
+        options[f"{name} ({code})"] = code
+    return options
+
+
+@st.cache_data(ttl=300)
+def cached_daily_aggregates(since=None, until=None, time_from=None, time_until=None,
+                            version=None) -> pd.DataFrame:
+    return get_file_processor().db.get_daily_aggregates(None, since, until, time_from, time_until)
+
+
+# Figures are rebuilt only when their inputs change. They are cached as plain
+# dicts (cheaper to pickle than Figure objects); st.plotly_chart accepts them as-is.
+@st.cache_data(ttl=30)
+def build_status_pie(passed: int, failed: int) -> dict:
+    import plotly.graph_objects as go
+    fig = go.Figure(data=[go.Pie(labels=['Passed', 'Failed'], values=[passed, failed], hole=0.3,
+                                 marker_colors=['#28a745', '#dc3545'])])
+    fig.update_layout(title="Validation Status Distribution", height=380)
+    return fig.to_dict()
+
+
+@st.cache_data(ttl=30)
+def build_daily_passed_line(daily: pd.DataFrame) -> dict:
+    # Single series: graph_objects skips plotly.express' internal groupby
+    import plotly.graph_objects as go
+    fig = go.Figure(go.Scatter(x=daily['date'], y=daily['passed_count'], mode='lines'))
+    fig.update_layout(title="Daily Passed Count", height=380, xaxis_title="date", yaxis_title="passed_count")
+    return fig.to_dict()
+
+
+# Every selectbox change reruns the page; a short TTL keeps those reruns from
+# re-issuing an FTP LIST. The processor is excluded from the key (leading _).
+@st.cache_data(ttl=15, show_spinner=False)
+def cached_ftp_listing(_processor: FTPProcessor, server: str, directory: str) -> list:
+    return _processor.list_ftp_files(directory)
+
+
+def invalidate_db_cache():
+    """Drop cached stats/history/listings after new processing results are written."""
+    cached_stats.clear()
+    cached_history.clear()
+    cached_daily_aggregates.clear()
+    build_daily_passed_line.clear()
+    # Processing moves files out of the inbox
+    cached_ftp_listing.clear()
+
+
 # Session state
 if 'ftp_processor' not in st.session_state:
-    st.session_state.ftp_processor = FTPProcessor()
+    st.session_state.ftp_processor = FTPProcessor(
+        ftp_config=get_ftp_config(ftp_config_mtime()),
+        file_processor=get_file_processor(),
+    )
 if 'connected' not in st.session_state:
     st.session_state.connected = False
 if 'selected_court' not in st.session_state:
@@ -31,7 +139,7 @@ if 'selected_court' not in st.session_state:
 # Courts
 if MULTI_COURT_SUPPORT:
     if 'court_manager' not in st.session_state:
-        st.session_state.court_manager = CourtConfigManager()  # type: ignore
+        st.session_state.court_manager = get_court_manager()
     if 'available_courts' not in st.session_state:
         try:
             courts = st.session_state.court_manager.get_all_courts()
@@ -44,11 +152,7 @@ def main():
     # Header + court selection
     if MULTI_COURT_SUPPORT and len(st.session_state.get('available_courts', [])) > 1:
         st.title("File Validator - FTP Integration")
-        court_options = {}
-        for code in st.session_state.available_courts:
-            ci = st.session_state.court_manager.get_court(code)
-            name = getattr(ci, 'name', code)
-            court_options[f"{name} ({code})"] = code
+        court_options = get_court_options(tuple(st.session_state.available_courts))
         label = st.selectbox("Select court", list(court_options.keys()))
         st.session_state.selected_court = court_options[label]
     else:
@@ -69,19 +173,8 @@ def main():
             disconnect_from_ftp()
 
     # Nav
-    page = st.sidebar.radio("Navigation", ["Dashboard", "FTP Files", "Process Files", "Analytics", "FTP Settings", "Help"])
-    if page == "Dashboard":
-        show_dashboard()
-    elif page == "FTP Files":
-        show_ftp_files()
-    elif page == "Process Files":
-        show_process_files()
-    elif page == "Analytics":
-        show_analytics()
-    elif page == "FTP Settings":
-        show_ftp_settings()
-    else:
-        show_help()
+    page = st.sidebar.radio("Navigation", list(PAGES))
+    PAGES[page]()
 
 
 def connect_to_ftp():
@@ -103,18 +196,24 @@ def disconnect_from_ftp():
 
 def show_dashboard():
     st.header("Dashboard")
-    db = DatabaseManager(st.session_state.ftp_processor.kem_config.db_path)
-    stats = db.get_statistics()
+    version = data_version()
+    stats = cached_stats(version=version)
+    total_files, passed_files = stats['total_files'], stats['passed_files']
+    rate = (passed_files / total_files * 100) if total_files else 0
     c1, c2, c3, c4 = st.columns(4)
     c1.metric("FTP", "Connected" if st.session_state.connected else "Disconnected")
-    c2.metric("Files", stats['total_files'])
-    rate = (stats['passed_files'] / stats['total_files'] * 100) if stats['total_files'] else 0
+    c2.metric("Files", total_files)
     c3.metric("Success %", f"{rate:.1f}%")
     c4.metric("Court Lines", stats['total_kem_lines'])
     st.subheader("Recent History")
-    hist = db.get_history(20)
-    if not hist.empty:
-        st.dataframe(hist[['file_name', 'processed_at', 'validation_status', 'kem_lines', 'success_rate']], width='stretch')
+    hist = cached_history(20, version=version) if total_files else None
+    if hist is not None and not hist.empty:
+        st.dataframe(
+            hist[['file_name', 'processed_at', 'validation_status', 'kem_lines', 'success_rate']],
+            width='stretch',
+            # Formatted client-side; the column stays numeric
+            column_config={'success_rate': st.column_config.NumberColumn(format="%.1f%%")},
+        )
     else:
         st.info("No history yet")
 
@@ -135,11 +234,19 @@ def show_ftp_files():
     dir_label = st.selectbox("Directory", ["inbox", "results", "processed", "invalid"])
     ftp_path = paths[dir_label]
     st.caption(ftp_path)
-    files = st.session_state.ftp_processor.list_ftp_files(ftp_path)
+    if st.button("Refresh listing"):
+        cached_ftp_listing.clear()
+    files = cached_ftp_listing(st.session_state.ftp_processor, cfg.ftp_server, ftp_path)
     if files:
+        if len(files) > MAX_TABLE_ROWS:
+            pages = (len(files) + MAX_TABLE_ROWS - 1) // MAX_TABLE_ROWS
+            page = st.number_input("Page", min_value=1, max_value=pages, value=1)
+            start = (int(page) - 1) * MAX_TABLE_ROWS
+            st.caption(f"Showing files {start + 1}-{min(start + MAX_TABLE_ROWS, len(files))} of {len(files):,}")
+            files = files[start:start + MAX_TABLE_ROWS]
         df = pd.DataFrame({"Filename": files, "Select": [False]*len(files)})
         edited = st.data_editor(df, hide_index=True, width='stretch', disabled=["Filename"])
-        selected = edited[edited["Select"]]["Filename"].tolist() if not edited.empty else []
+        selected = edited["Filename"].to_numpy()[edited["Select"].to_numpy(dtype=bool)].tolist()
         c1, c2 = st.columns(2)
         with c1:
             if st.button("Process Selected", disabled=not selected):
@@ -156,12 +263,14 @@ def show_process_files():
     if not st.session_state.connected:
         st.warning("Connect first")
         return
-    files = st.session_state.ftp_processor.list_ftp_files(st.session_state.ftp_processor.ftp_config.ftp_inbox)
+    cfg = st.session_state.ftp_processor.ftp_config
+    files = cached_ftp_listing(st.session_state.ftp_processor, cfg.ftp_server, cfg.ftp_inbox)
     if files:
         f = st.selectbox("Select file", files)
         if st.button("Process File"):
             with st.spinner("Processing..."):
                 res = st.session_state.ftp_processor.process_ftp_file(f, court_code=st.session_state.selected_court)
+            invalidate_db_cache()
             if res['status'] == 'success':
                 st.success("Processed")
                 st.json({k: v for k, v in res.items() if k in ('validation_status', 'stats', 'ftp_csv_path')})
@@ -175,16 +284,15 @@ def show_process_files():
 def show_analytics():
     st.header("Analytics & Archives")
 
-    # High-level processing metrics + charts
-    db = DatabaseManager(st.session_state.ftp_processor.kem_config.db_path)
-    history = db.get_history(1000)
-    if history.empty:
+    # High-level processing metrics + charts, all from the SQL daily
+    # aggregate so every number covers the same rows
+    import datetime as _dt
+    version = data_version()
+    all_days = cached_daily_aggregates(version=version) if version[0] else None
+    days = all_days['date'].dropna() if all_days is not None else None
+    if days is None or days.empty:
         st.info("No data available yet. Process some files to populate analytics.")
     else:
-        # Date/time preparation
-        history['processed_at_dt'] = pd.to_datetime(history['processed_at'])
-        history['date'] = history['processed_at_dt'].dt.date
-
         # Quick time window (relative to now)
         time_window = st.selectbox(
             "Quick Time Window",
@@ -200,10 +308,9 @@ def show_analytics():
             help="Apply a relative time window filter based on current time",
         )
 
-        filtered = history
+        # processed_at bounds and optional time-of-day window for the aggregate
+        since = until = time_from = time_until = None
         if time_window != "All":
-            import datetime as _dt
-            now = _dt.datetime.now()
             delta = {
                 "Last 1 hour": _dt.timedelta(hours=1),
                 "Last 6 hours": _dt.timedelta(hours=6),
@@ -211,62 +318,50 @@ def show_analytics():
                 "Last 24 hours": _dt.timedelta(hours=24),
                 "Last 7 days": _dt.timedelta(days=7),
             }[time_window]
-            cutoff = now - delta
-            filtered = filtered[filtered['processed_at_dt'] >= cutoff]
+            since = (_dt.datetime.now() - delta).strftime('%Y-%m-%d %H:%M:%S')
         else:
-            # Date + optional time-of-day filters
+            # Date + optional time-of-day filters; defaults span every recorded day
             col1, col2 = st.columns(2)
             with col1:
-                start_date = st.date_input("Start Date", history['date'].min())
+                start_date = st.date_input("Start Date", _dt.date.fromisoformat(days.min()))
             with col2:
-                end_date = st.date_input("End Date", history['date'].max())
-            mask = (history['date'] >= start_date) & (history['date'] <= end_date)
-            filtered = history.loc[mask]
+                end_date = st.date_input("End Date", _dt.date.fromisoformat(days.max()))
+            since = start_date.isoformat()
+            until = (end_date + _dt.timedelta(days=1)).isoformat()
 
             # Optional time-of-day filter
             use_time = st.checkbox("Filter by time of day", value=False, help="Further restrict results to a time-of-day range")
             if use_time:
-                import datetime as _dt
                 t1 = st.time_input("Start Time", value=_dt.time(0, 0))
                 t2 = st.time_input("End Time", value=_dt.time(23, 59))
-                times = filtered['processed_at_dt'].dt.time
-                if t1 <= t2:
-                    filtered = filtered[(times >= t1) & (times <= t2)]
-                else:
-                    # Cross-midnight window
-                    filtered = filtered[(times >= t1) | (times <= t2)]
-
-        # Metrics
+                # Minute-resolution inputs: the end minute is included in full
+                time_from = t1.strftime('%H:%M:00')
+                time_until = t2.strftime('%H:%M:59')
+
+        daily_agg = cached_daily_aggregates(since, until, time_from, time_until, version=version)
+        total = int(daily_agg['total_files'].sum())
+        passed = int(daily_agg['passed_files'].sum())
+        failed = int(daily_agg['failed_files'].sum())
+        avg_rate = float((daily_agg['avg_success_rate'] * daily_agg['total_files']).sum() / total) if total else 0.0
         colm1, colm2, colm3, colm4 = st.columns(4)
         with colm1:
-            st.metric("Total Files", len(filtered))
+            st.metric("Total Files", total)
         with colm2:
-            passed = int((filtered['validation_status'] == 'passed').sum())
             st.metric("Passed", passed)
         with colm3:
-            failed = int((filtered['validation_status'] == 'failed').sum())
             st.metric("Failed", failed)
         with colm4:
-            avg_rate = float(filtered['success_rate'].mean()) if not filtered.empty else 0.0
             st.metric("Avg Success Rate", f"{avg_rate:.1f}%")
 
         # Charts (best-effort if plotly available)
         try:
-            import plotly.express as px
-            import plotly.graph_objects as go
-
             colc1, colc2 = st.columns(2)
             with colc1:
-                fig = go.Figure(data=[go.Pie(labels=['Passed', 'Failed'], values=[passed, failed], hole=0.3,
-                                             marker_colors=['#28a745', '#dc3545'])])
-                fig.update_layout(title="Validation Status Distribution", height=380)
-                st.plotly_chart(fig, width='stretch')
+                st.plotly_chart(build_status_pie(passed, failed), width='stretch')
             with colc2:
-                daily = filtered.groupby('date').agg({'validation_status': lambda x: (x == 'passed').sum()}).reset_index()
+                daily = daily_agg[['date', 'passed_files']]
                 daily.columns = ['date', 'passed_count']
-                fig = px.line(daily, x='date', y='passed_count', title="Daily Passed Count")
-                fig.update_layout(height=380)
-                st.plotly_chart(fig, width='stretch')
+                st.plotly_chart(build_daily_passed_line(daily), width='stretch')
         except Exception:
             st.caption("Charts unavailable (plotly not installed)")
 
@@ -276,9 +371,7 @@ def show_analytics():
     # Archive tools
     sel_court = None
     if MULTI_COURT_SUPPORT and 'available_courts' in st.session_state:
-        opts = {"All Courts": None}
-        for code in st.session_state.available_courts:
-            opts[code] = code
+        opts = get_court_options(tuple(st.session_state.available_courts), include_all=True)
         label = st.selectbox("Select court for archive actions", list(opts.keys()), index=0)
         sel_court = opts[label]
 
@@ -373,6 +466,12 @@ def show_ftp_settings():
     with c1:
         batch = st.number_input("Batch Size", value=int(cfg.batch_size))
         upload_results = st.checkbox("Upload Results", cfg.upload_results)
+        connections = st.number_input(
+            "Parallel Connections", min_value=1, max_value=MAX_PARALLEL_CONNECTIONS,
+            # Clamped, so an out-of-range hand edit cannot break this page
+            value=cfg.get_max_parallel_connections(),
+            help="FTP logins used by 'Process Selected'; keep within the server's connection limit",
+        )
     with c2:
         interval = st.number_input("Interval (min)", value=int(cfg.process_interval_minutes))
         archive_on_ftp = st.checkbox("Archive on FTP", cfg.archive_on_ftp)
@@ -390,15 +489,42 @@ def show_ftp_settings():
             "ftp_processed": processed,
             "ftp_invalid": invalid,
             "batch_size": int(batch),
+            "max_parallel_connections": int(connections),
             "process_interval_minutes": int(interval),
             "local_temp_dir": tempdir,
             "upload_results": upload_results,
             "archive_on_ftp": archive_on_ftp,
             "delete_after_download": delete_after,
         }
-        with open("ftp_config.json", "w") as f:
-            json.dump(data, f, indent=2)
-        st.success("Saved")
+        # Merge into the existing file so keys this form does not edit
+        # (court_paths, court_detection, ...) are kept
+        try:
+            with open(FTP_CONFIG_PATH, "r") as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            saved = {}
+        if all(saved.get(k, getattr(cfg, k, None)) == v for k, v in data.items()):
+            st.info("No changes to save")
+        else:
+            saved.update(data)
+            with open(FTP_CONFIG_PATH, "w") as f:
+                json.dump(saved, f, indent=2)
+            get_ftp_config.clear()
+            new_cfg = get_ftp_config(ftp_config_mtime())
+            proc = st.session_state.ftp_processor
+            if any(getattr(cfg, k, None) != data[k] for k in CONNECTION_KEYS):
+                # New server or credentials: the live connection is stale
+                if st.session_state.connected:
+                    disconnect_from_ftp()
+                st.session_state.ftp_processor = FTPProcessor(
+                    ftp_config=new_cfg,
+                    file_processor=get_file_processor(),
+                )
+            else:
+                # Paths/processing options only: keep the connection
+                proc.ftp_config = new_cfg
+                proc._setup_local_dirs()
+            st.success("Saved")
     # Test connection control mirrored here
     if st.button("Test Connection"):
         with st.spinner("Testing FTP connection..."):
@@ -411,9 +537,7 @@ def show_ftp_settings():
     st.subheader("Archive Tools")
     sel = None
     if MULTI_COURT_SUPPORT and 'available_courts' in st.session_state:
-        opts = {"All Courts": None}
-        for code in st.session_state.available_courts:
-            opts[code] = code
+        opts = get_court_options(tuple(st.session_state.available_courts), include_all=True)
         label = st.selectbox("Cleanup court", list(opts.keys()), key="settings_cleanup_court")
         sel = opts[label]
     c1, c2, c3 = st.columns(3)
@@ -434,22 +558,51 @@ def show_help():
 
 
 def process_batch(batch_size=None):
-    res = st.session_state.ftp_processor.process_batch(batch_size)
-    if res:
-        st.success(f"Processed {len(res)} files")
-        for r in res:
-            icon = '✔' if r['status'] == 'success' else '✖'
-            st.write(f"{icon} {r.get('filename','?')}: {r.get('validation_status', r.get('reason','N/A'))}")
+    results = st.session_state.ftp_processor.process_batch(batch_size)
+    invalidate_db_cache()
+    if results:
+        st.success(f"Processed {len(results)} files")
+        # One text block instead of a widget per file
+        st.text("\n".join(
+            f"{'✔' if r['status'] == 'success' else '✖'} {r.get('filename','?')}: "
+            f"{r.get('validation_status', r.get('reason','N/A'))}"
+            for r in results
+        ))
     else:
         st.info("No files")
 
 
 def process_selected_files(files, directory):
-    for f in files:
-        with st.spinner(f"Processing {f}..."):
-            r = st.session_state.ftp_processor.process_ftp_file(f, court_code=st.session_state.selected_court, source_path=directory)
-        icon = '✔' if r['status'] == 'success' else '✖'
-        st.write(f"{icon} {f}: {r.get('validation_status', r.get('reason','N/A'))}")
+    # Results stream in as workers finish; the progress bar and the log
+    # placeholder are refreshed in ~1% steps rather than once per file
+    tick = max(1, len(files) // 100)
+    lines = []
+    failed = 0
+    results = st.session_state.ftp_processor.process_ftp_files_concurrently(
+        files,
+        court_code=st.session_state.selected_court,
+        source_dir=directory,
+    )
+    with st.status(f"Processing {len(files)} files...", expanded=True) as status:
+        progress = st.progress(0.0)
+        log = st.empty()
+        try:
+            for i, r in enumerate(results, 1):
+                f = r['filename']
+                ok = r['status'] == 'success'
+                failed += not ok
+                lines.append(f"{'✔' if ok else '✖'} {f}: {r.get('validation_status', r.get('reason','N/A'))}")
+                if i % tick == 0 or i == len(files):
+                    progress.progress(i / len(files), text=f"Processed {f}")
+                    log.text("\n".join(lines))
+        except Exception as e:
+            st.error(f"Failed: {e}")
+            failed += 1
+        status.update(
+            label=f"Processed {len(lines)} of {len(files)} files ({failed} failed)",
+            state="error" if failed else "complete",
+        )
+    invalidate_db_cache()
 
 
 def download_selected_files(files, directory):
@@ -457,28 +610,15 @@ def download_selected_files(files, directory):
         st.info(f"Downloading {f} from {directory}")
 
 
-# Override helpers with cleaned icons display
-def process_batch(batch_size=None):
-    results = st.session_state.ftp_processor.process_batch(batch_size)
-    if results:
-        st.success(f"Processed {len(results)} files")
-        for r in results:
-            icon = '✔' if r['status'] == 'success' else '✖'
-            st.write(f"{icon} {r.get('filename','?')}: {r.get('validation_status', r.get('reason','N/A'))}")
-    else:
-        st.info("No files")
-
-
-def process_selected_files(files, directory):
-    for f in files:
-        with st.spinner(f"Processing {f}..."):
-            r = st.session_state.ftp_processor.process_ftp_file(
-                f,
-                court_code=st.session_state.selected_court,
-                source_path=directory,
-            )
-        icon = '✔' if r['status'] == 'success' else '✖'
-        st.write(f"{icon} {f}: {r.get('validation_status', r.get('reason','N/A'))}")
+# Navigation label -> page renderer, in sidebar order
+PAGES = {
+    "Dashboard": show_dashboard,
+    "FTP Files": show_ftp_files,
+    "Process Files": show_process_files,
+    "Analytics": show_analytics,
+    "FTP Settings": show_ftp_settings,
+    "Help": show_help,
+}
 
 
 if __name__ == "__main__":